@@ -2,119 +2,426 @@
 
 # app.py
 import streamlit as st
+import pandas as pd
 from datetime import date, datetime
-import json
+import atexit
+import html
+import orjson
 import os
-import uuid
+import time
 
 DATA_FILE = "data.json"
+LOG_FILE = "data.log"
+# Minimum seconds between flushes; burst edits coalesce into one write.
+FLUSH_DEBOUNCE_S = 0.25
+# Rewrite the snapshot and truncate the log once it grows past this.
+COMPACT_LOG_BYTES = 64 * 1024
+
+# Injected once by header(); per-row renders reference the classes instead
+# of rebuilding inline styles and going through the markdown parser.
+_APP_CSS = """
+<style>
+.habit-name { font-weight: 600; }
+.habit-created { font-size: 0.85em; color: gray; }
+</style>
+"""
+
+_PAGES = ("To-Do List", "Habit Tracker", "Settings")
+_SIDEBAR_INFO = (
+    "---\n"
+    "Data storage:\n\n"
+    ":information_source: Data is stored in `data.json` in the app folder "
+    "during runtime. On Hugging Face Spaces a container restart will reset "
+    "uncommitted changes."
+)
 
 # --------------------
 # Utility: Data store
 # --------------------
-def load_data():
-    """Load data from disk into a Python dict. Return default structure if missing."""
-    default = {
+def _default_data():
+    return {
         "todos": [],        # list of dicts: {id, text, done, created_at}
         "habits": []        # list of dicts: {id, name, created_at, completed_dates: [ISO dates strings]}
     }
+
+
+def _file_stamp(path):
+    """(mtime, size) cache-key component; (0, 0) when the file is missing."""
+    try:
+        s = os.stat(path)
+        return (s.st_mtime, s.st_size)
+    except OSError:
+        return (0, 0)
+
+
+def _replay_log(raw):
+    """Apply logged mutations on top of the snapshot dict in place.
+
+    Replay is idempotent (adds skip existing ids, sets store absolute
+    values) so a crash between snapshot rewrite and log truncation cannot
+    duplicate or corrupt items. A torn final line from a crashed append is
+    dropped.
+    """
+    if not os.path.exists(LOG_FILE):
+        return
+    todos = {t["id"]: t for t in raw["todos"]}
+    habits = {h["id"]: h for h in raw["habits"]}
+    with open(LOG_FILE, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                op = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+            kind = op["op"]
+            if kind == "add_todo":
+                item = op["item"]
+                if item["id"] not in todos:
+                    raw["todos"].append(item)
+                    todos[item["id"]] = item
+            elif kind == "set_todo":
+                t = todos.get(op["id"])
+                if t is not None:
+                    if "done" in op:
+                        t["done"] = op["done"]
+                    if "text" in op:
+                        t["text"] = op["text"]
+            elif kind == "del_todo":
+                t = todos.pop(op["id"], None)
+                if t is not None:
+                    raw["todos"].remove(t)
+            elif kind == "add_habit":
+                item = op["item"]
+                if item["id"] not in habits:
+                    raw["habits"].append(item)
+                    habits[item["id"]] = item
+            elif kind == "set_habit_date":
+                h = habits.get(op["id"])
+                if h is not None:
+                    dates = h["completed_dates"]
+                    if op["present"]:
+                        if op["date"] not in dates:
+                            dates.append(op["date"])
+                    elif op["date"] in dates:
+                        dates.remove(op["date"])
+            elif kind == "del_habit":
+                h = habits.pop(op["id"], None)
+                if h is not None:
+                    raw["habits"].remove(h)
+            elif kind == "clear":
+                raw["todos"].clear()
+                raw["habits"].clear()
+                todos.clear()
+                habits.clear()
+            if "next_id" in op:
+                raw["_next_id"] = max(raw.get("_next_id", 1), op["next_id"])
+
+
+@st.cache_data
+def _load_data_cached(snap_stamp, log_stamp):
+    """Parse the data.json snapshot and replay data.log on top, cached per
+    on-disk version of both files so concurrent sessions/tabs share one
+    parse. st.cache_data hands each caller its own copy, so the returned
+    dict is safe to mutate in session state."""
+    raw = _default_data()
     if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                raw = json.load(f)
-            # merge with defaults to avoid schema break
-            for k, v in default.items():
-                if k not in raw:
-                    raw[k] = v
-            return raw
-        except Exception:
-            # If file corrupt, back it up and start fresh
-            backup_name = f"{DATA_FILE}.bak.{int(datetime.now().timestamp())}"
-            os.rename(DATA_FILE, backup_name)
-            return default
-    else:
-        return default
+        # One dict walk merges loaded keys over the defaults, so missing
+        # keys never break the schema.
+        with open(DATA_FILE, "rb") as f:
+            raw.update(orjson.loads(f.read()))
+    _replay_log(raw)
+    for h in raw["habits"]:
+        # Runtime membership set; O(1) 'done today?' checks.
+        h["_completed_set"] = set(h.get("completed_dates", []))
+        # Newest-first history, kept ordered on mutation so the history
+        # view never has to re-sort.
+        h["_completed_desc"] = sorted(h["_completed_set"], reverse=True)
+        # Formatted once here instead of per rerun in habit_page.
+        h["_created_display"] = datetime.fromisoformat(h["created_at"]).strftime("%b %d, %Y")
+    return raw
+
+
+def load_data():
+    """Load data from disk into a Python dict. Return default structure if missing."""
+    if not (os.path.exists(DATA_FILE) or os.path.exists(LOG_FILE)):
+        return _default_data()
+    try:
+        return _load_data_cached(_file_stamp(DATA_FILE), _file_stamp(LOG_FILE))
+    except Exception:
+        # If either file is corrupt, back up whichever exist and start
+        # fresh. Moving the log aside too matters: a poison line would
+        # otherwise fail replay again on every subsequent load.
+        ts = int(datetime.now().timestamp())
+        for path in (DATA_FILE, LOG_FILE):
+            if os.path.exists(path):
+                os.rename(path, f"{path}.bak.{ts}")
+        return _default_data()
+
+
+def _serializable(data):
+    """Return a JSON-safe copy of data: drop runtime-only '_'-prefixed
+    fields and materialize completed_dates from the membership set."""
+    out = dict(data)
+    habits = []
+    for h in data["habits"]:
+        clean = {k: v for k, v in h.items() if not k.startswith("_")}
+        clean["completed_dates"] = h["_completed_desc"][::-1]
+        habits.append(clean)
+    out["habits"] = habits
+    return out
 
 
 def save_data(data):
-    """Save data (dict) to disk."""
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    """Save data (dict) to disk atomically.
+
+    Serialize to one bytes buffer first so the payload goes out in a single
+    write(), then fsync + rename so a crash mid-save can never leave a
+    truncated data.json behind.
+    """
+    # Compact encoding: data.json is only read back by the app, so skip
+    # the pretty-printer. The settings export stays indented for humans.
+    buf = orjson.dumps(_serializable(data))
+    tmp = DATA_FILE + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, buf)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp, DATA_FILE)
 
 
 # --------------
 # Helpers
 # --------------
 def new_id():
-    return str(uuid.uuid4())
+    """Return the next id from a monotonic counter persisted in app_data.
+
+    Short numeric ids keep data.json and widget keys small; uuid4 strings
+    were 36 chars each plus an os.urandom call per item.
+    """
+    data = st.session_state.app_data
+    n = data.setdefault("_next_id", 1)
+    data["_next_id"] = n + 1
+    return str(n)
 
 
 def ensure_session_state():
     """Ensure session state contains the app data (loaded once per session)."""
     if "app_data" not in st.session_state:
         st.session_state.app_data = load_data()
+        rebuild_indexes()
+        st.session_state._todo_version = 0
+        st.session_state._data_version = 0
+        st.session_state._pending_ops = []
+        st.session_state._last_flush_ts = 0.0
+        # The module-level atexit hook holds a direct reference to this
+        # list: session state is unreadable from the main thread at
+        # interpreter exit.
+        _ALL_PENDING_OPS.append(st.session_state._pending_ops)
+
+
+def rebuild_indexes():
+    """Build id -> item lookup tables so toggles/deletes avoid O(n) scans."""
+    data = st.session_state.app_data
+    st.session_state._todo_idx = {t["id"]: t for t in data["todos"]}
+    st.session_state._habit_idx = {h["id"]: h for h in data["habits"]}
+
+
+def _insort_desc(dates, d):
+    """Insert d into a descending-sorted list of ISO date strings."""
+    lo, hi = 0, len(dates)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if dates[mid] > d:
+            lo = mid + 1
+        else:
+            hi = mid
+    dates.insert(lo, d)
+
+
+# Every session's pending-op queue, so the process-exit hook can flush
+# them without touching st.session_state.
+_ALL_PENDING_OPS = []
+
+
+def _flush_ops(ops):
+    """Append ops to the log in one write; clears the list on success."""
+    if not ops:
+        return
+    buf = b"".join(orjson.dumps(op) + b"\n" for op in ops)
+    fd = os.open(LOG_FILE, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, buf)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    ops.clear()
+
+
+def _flush_all_pending():
+    for ops in _ALL_PENDING_OPS:
+        _flush_ops(ops)
+
+
+atexit.register(_flush_all_pending)
+
+
+def record_op(op):
+    """Queue one mutation for the append-only log; flushed at end of rerun."""
+    st.session_state._pending_ops.append(op)
+    st.session_state._data_version += 1
+
+
+def flush_data(force=False):
+    """Append pending mutations to the log, debouncing bursts of edits.
+
+    A click costs one O(ops) append instead of rewriting the whole data
+    file; the snapshot is rebuilt only when the log passes the compaction
+    threshold. main() always forces a flush at end of rerun, so the
+    debounce only defers mid-rerun callers and never loses edits.
+    """
+    ops = st.session_state.get("_pending_ops")
+    if not ops:
+        return
+    now = time.monotonic()
+    if not force and (now - st.session_state.get("_last_flush_ts", 0.0)) < FLUSH_DEBOUNCE_S:
+        return
+    _flush_ops(ops)
+    st.session_state._last_flush_ts = now
+    if os.path.getsize(LOG_FILE) >= COMPACT_LOG_BYTES:
+        compact_data()
+
+
+def compact_data():
+    """Fold the log into a fresh snapshot and truncate it.
+
+    Snapshot first, truncate second: if we crash in between, replaying the
+    stale log over the new snapshot is a no-op because replay is
+    idempotent.
+    """
+    save_data(st.session_state.app_data)
+    open(LOG_FILE, "wb").close()
 
 
 def add_todo(text):
+    """Add a todo; return True if one was actually created."""
     if not text.strip():
-        return
-    todos = st.session_state.app_data["todos"]
-    todos.append({
+        return False
+    todo = {
         "id": new_id(),
         "text": text.strip(),
         "done": False,
-        "created_at": datetime.now().isoformat()
-    })
-    save_data(st.session_state.app_data)
+        "created_at": st.session_state._now_iso
+    }
+    st.session_state.app_data["todos"].append(todo)
+    st.session_state._todo_idx[todo["id"]] = todo
+    st.session_state._todo_version += 1
+    record_op({"op": "add_todo", "item": todo,
+               "next_id": st.session_state.app_data["_next_id"]})
+    return True
 
 
 def delete_todo(todo_id):
-    st.session_state.app_data["todos"] = [t for t in st.session_state.app_data["todos"] if t["id"] != todo_id]
-    save_data(st.session_state.app_data)
+    """Delete a todo; return True if it existed."""
+    todo = st.session_state._todo_idx.pop(todo_id, None)
+    if todo is None:
+        return False
+    st.session_state.app_data["todos"].remove(todo)
+    st.session_state._todo_version += 1
+    record_op({"op": "del_todo", "id": todo_id})
+    return True
 
 
 def toggle_todo(todo_id):
-    for t in st.session_state.app_data["todos"]:
-        if t["id"] == todo_id:
-            t["done"] = not t.get("done", False)
-            break
-    save_data(st.session_state.app_data)
+    """Flip a todo's done flag; return True if it existed."""
+    todo = st.session_state._todo_idx.get(todo_id)
+    if todo is None:
+        return False
+    todo["done"] = not todo.get("done", False)
+    st.session_state._todo_version += 1
+    record_op({"op": "set_todo", "id": todo_id, "done": todo["done"]})
+    return True
+
+
+def rename_todo(todo_id, text):
+    """Change a todo's text; return True if it actually changed."""
+    todo = st.session_state._todo_idx.get(todo_id)
+    text = text.strip()
+    if todo is None or not text or text == todo["text"]:
+        return False
+    todo["text"] = text
+    st.session_state._todo_version += 1
+    record_op({"op": "set_todo", "id": todo_id, "text": text})
+    return True
 
 
 def add_habit(name):
+    """Add a habit; return True if one was actually created."""
     if not name.strip():
-        return
-    habits = st.session_state.app_data["habits"]
-    habits.append({
+        return False
+    now = st.session_state._now
+    habit = {
         "id": new_id(),
         "name": name.strip(),
-        "created_at": datetime.now().isoformat(),
-        "completed_dates": []  # store ISO date strings
-    })
-    save_data(st.session_state.app_data)
+        "created_at": st.session_state._now_iso,
+        "completed_dates": [],  # store ISO date strings
+        "_completed_set": set(),
+        "_completed_desc": [],
+        "_created_display": now.strftime("%b %d, %Y")
+    }
+    st.session_state.app_data["habits"].append(habit)
+    st.session_state._habit_idx[habit["id"]] = habit
+    record_op({"op": "add_habit",
+               "item": {k: v for k, v in habit.items() if not k.startswith("_")},
+               "next_id": st.session_state.app_data["_next_id"]})
+    return True
 
 
 def delete_habit(habit_id):
-    st.session_state.app_data["habits"] = [h for h in st.session_state.app_data["habits"] if h["id"] != habit_id]
-    save_data(st.session_state.app_data)
+    """Delete a habit; return True if it existed."""
+    habit = st.session_state._habit_idx.pop(habit_id, None)
+    if habit is None:
+        return False
+    st.session_state.app_data["habits"].remove(habit)
+    record_op({"op": "del_habit", "id": habit_id})
+    return True
 
 
 def toggle_habit_today(habit_id, checked):
+    """Set today's completion for a habit; return True if state changed.
+
+    Asking for a state the habit is already in records nothing, so no-op
+    clicks never reach the log.
+    """
     today = date.today().isoformat()
-    for h in st.session_state.app_data["habits"]:
-        if h["id"] == habit_id:
-            if checked and today not in h["completed_dates"]:
-                h["completed_dates"].append(today)
-            elif (not checked) and today in h["completed_dates"]:
-                h["completed_dates"].remove(today)
-            break
-    save_data(st.session_state.app_data)
+    habit = st.session_state._habit_idx.get(habit_id)
+    if habit is None:
+        return False
+    if checked and today not in habit["_completed_set"]:
+        habit["_completed_set"].add(today)
+        _insort_desc(habit["_completed_desc"], today)
+    elif (not checked) and today in habit["_completed_set"]:
+        habit["_completed_set"].discard(today)
+        habit["_completed_desc"].remove(today)
+    else:
+        return False
+    record_op({"op": "set_habit_date", "id": habit_id, "date": today, "present": checked})
+    return True
 
 
 def clear_all_data(confirm=False):
-    if confirm:
-        st.session_state.app_data = {"todos": [], "habits": []}
-        save_data(st.session_state.app_data)
+    """Reset all app data; return True if there was anything to clear."""
+    data = st.session_state.app_data
+    if not confirm or not (data["todos"] or data["habits"]):
+        return False
+    st.session_state.app_data = {"todos": [], "habits": []}
+    rebuild_indexes()
+    st.session_state._todo_version += 1
+    record_op({"op": "clear"})
+    return True
 
 
 # -----------------
@@ -136,6 +443,29 @@ def header():
         """,
         unsafe_allow_html=True,
     )
+    st.html(_APP_CSS)
+
+
+def _apply_todo_edits():
+    """Apply the todo table's pending edits (toggles, renames, adds,
+    deletes) as one batch through the regular mutators, then flush a
+    single write."""
+    state = st.session_state[st.session_state._todo_editor_key]
+    row_ids = st.session_state._todo_rows
+    idx = st.session_state._todo_idx
+    for row, edits in state["edited_rows"].items():
+        todo_id = row_ids[row]
+        if "done" in edits:
+            todo = idx.get(todo_id)
+            if todo is not None and todo["done"] != edits["done"]:
+                toggle_todo(todo_id)
+        if "text" in edits:
+            rename_todo(todo_id, edits["text"] or "")
+    for row in state["deleted_rows"]:
+        delete_todo(row_ids[row])
+    for added in state["added_rows"]:
+        add_todo(added.get("text", ""))
+    flush_data()
 
 
 def todo_page():
@@ -149,23 +479,38 @@ def todo_page():
             st.rerun()
 
     todos = st.session_state.app_data["todos"]
-    # Sort with not done first, then created time
-    todos_sorted = sorted(todos, key=lambda x: (x.get("done", False), x.get("created_at", "")))
+    # Sort with not done first, then created time. Re-sorting every rerun
+    # is O(n log n) per click, so cache until a todo mutator bumps the version.
+    if st.session_state.get("_sorted_todos_version") != st.session_state._todo_version:
+        st.session_state._sorted_todos = sorted(todos, key=lambda x: (x["done"], x["created_at"]))
+        st.session_state._sorted_todos_version = st.session_state._todo_version
+    todos_sorted = st.session_state._sorted_todos
     if not todos_sorted:
         st.info("No tasks yet. Add one above!")
     else:
-        for t in todos_sorted:
-            cols = st.columns([0.05, 0.8, 0.15])
-            checked = cols[0].checkbox("", value=t.get("done", False), key=f"todo_chk_{t['id']}")
-            # If checkbox changed, toggle
-            if checked != t.get("done", False):
-                toggle_todo(t["id"])
-                st.rerun()
-            text_style = "text-decoration: line-through; color: gray;" if t.get("done", False) else ""
-            cols[1].markdown(f"<div style='{text_style}'>{st.session_state.app_data['todos'] and t['text']}</div>", unsafe_allow_html=True)
-            if cols[2].button("Delete", key=f"todo_del_{t['id']}"):
-                delete_todo(t["id"])
-                st.rerun()
+        # One editable table instead of a checkbox + delete button per row:
+        # a whole batch of edits costs a single rerun and a single flush.
+        # Keying the editor on the todo version resets its diff state once
+        # the edits have been applied to app_data.
+        st.session_state._todo_rows = [t["id"] for t in todos_sorted]
+        editor_key = f"todos_editor_{st.session_state._todo_version}"
+        st.session_state._todo_editor_key = editor_key
+        df = pd.DataFrame({
+            "done": [t["done"] for t in todos_sorted],
+            "text": [t["text"] for t in todos_sorted],
+        })
+        st.data_editor(
+            df,
+            key=editor_key,
+            on_change=_apply_todo_edits,
+            num_rows="dynamic",
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "done": st.column_config.CheckboxColumn("Done"),
+                "text": st.column_config.TextColumn("Task"),
+            },
+        )
 
 
 def habit_page():
@@ -184,20 +529,17 @@ def habit_page():
     if not habits:
         st.info("No habits yet. Add a new habit above!")
     else:
-        # Display checkboxes and allow toggling
-        done_count = 0
+        # One membership test per habit, shared by the counter and checkboxes
+        done_count = sum(1 for h in habits if today in h["_completed_set"])
         for h in habits:
-            checked = (today in h.get("completed_dates", []))
+            checked = (today in h["_completed_set"])
             cols = st.columns([0.05, 0.7, 0.25])
             new_checked = cols[0].checkbox("", value=checked, key=f"habit_chk_{h['id']}")
             if new_checked != checked:
                 toggle_habit_today(h["id"], new_checked)
                 st.rerun()
-            cols[1].markdown(f"**{h['name']}**")
-            created = datetime.fromisoformat(h["created_at"]).strftime("%b %d, %Y")
-            cols[2].markdown(f"<small>Created: {created}</small>", unsafe_allow_html=True)
-            if today in h.get("completed_dates", []):
-                done_count += 1
+            cols[1].html(f'<div class="habit-name">{html.escape(h["name"])}</div>')
+            cols[2].html(f'<div class="habit-created">Created: {h["_created_display"]}</div>')
 
         # Show progress
         progress = (done_count / len(habits)) if habits else 0.0
@@ -207,7 +549,7 @@ def habit_page():
         # Quick view to mark any habit for other days (optional advanced feature)
         with st.expander("View habit completion history"):
             for h in habits:
-                cd = sorted(h.get("completed_dates", []), reverse=True)
+                cd = h["_completed_desc"]
                 sample = ", ".join(cd[:10]) if cd else "No completions yet"
                 st.write(f"- **{h['name']}**: {sample}")
 
@@ -217,10 +559,8 @@ def habit_page():
 # -----------------
 def sidebar():
     st.sidebar.title("Navigation")
-    page = st.sidebar.radio("Choose page", ["To-Do List", "Habit Tracker", "Settings"])
-    st.sidebar.markdown("---")
-    st.sidebar.write("Data storage:")
-    st.sidebar.info("Data is stored in `data.json` in the app folder during runtime. On Hugging Face Spaces a container restart will reset uncommitted changes.")
+    page = st.sidebar.radio("Choose page", _PAGES)
+    st.sidebar.markdown(_SIDEBAR_INFO)
     return page
 
 
@@ -230,7 +570,13 @@ def settings_page():
     data = st.session_state.app_data
 
     # Export JSON
-    st.download_button("Download data.json", json.dumps(data, indent=2, ensure_ascii=False), file_name="data.json", mime="application/json")
+    # Re-encode the export only when the data version moved, memoized in
+    # session state (st.cache_data is shared process-wide, so a per-session
+    # counter is not a safe key for session-local data).
+    if st.session_state.get("_download_version") != st.session_state._data_version:
+        st.session_state._download_payload = orjson.dumps(_serializable(data), option=orjson.OPT_INDENT_2)
+        st.session_state._download_version = st.session_state._data_version
+    st.download_button("Download data.json", st.session_state._download_payload, file_name="data.json", mime="application/json")
 
     if st.button("Backup & Reset (clear all tasks & habits)"):
         st.warning("This will delete all to-dos and habits from the current runtime.", icon="⚠️")
@@ -240,7 +586,7 @@ def settings_page():
             st.rerun()
 
     st.markdown("### Current data preview")
-    st.write(data)
+    st.write(_serializable(data))
 
 
 # -----------------
@@ -248,17 +594,25 @@ def settings_page():
 # -----------------
 def main():
     st.set_page_config(page_title="To-Do & Habit Tracker", page_icon="✅", layout="centered")
+    # One wall-clock read per rerun; mutators reuse it instead of calling
+    # datetime.now() per added item.
+    st.session_state._now = datetime.now()
+    st.session_state._now_iso = st.session_state._now.isoformat()
     ensure_session_state()
     header()
     page = sidebar()
-    if page == "To-Do List":
+    if page == _PAGES[0]:
         todo_page()
-    elif page == "Habit Tracker":
+    elif page == _PAGES[1]:
         habit_page()
-    elif page == "Settings":
+    elif page == _PAGES[2]:
         settings_page()
     else:
         st.write("Page not found")
+    # One coalesced write per rerun instead of one per mutation. Forced:
+    # anything a mutator queued this rerun must be durable before the
+    # script yields, or a closed tab would lose it.
+    flush_data(force=True)
 
 
 if __name__ == "__main__":